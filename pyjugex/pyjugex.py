@@ -3,17 +3,10 @@ from __future__ import division
 import os
 import numpy as np
 import json
-import scipy as sp
-import xmltodict
-import statsmodels.api as sm
-from statsmodels.formula.api import ols
-import requests, requests.exceptions
 import shutil
 import multiprocessing
-import nibabel as nib
 import logging
 import csv
-import pandas as pd
 import tempfile
 
 """
@@ -52,8 +45,8 @@ def transform_samples_MRI_to_MNI52(samples, transformation_mat):
           numpy.ndarray: A two dimensional numpy array where each row represents a three dimensional coordinate in MNI52 space.
     """
     np_T = np.array(transformation_mat[0:3, 0:4])
-    mri = np.vstack(s['sample']['mri'] for s in samples)
-    add = np.ones((len(mri), 1), dtype=np.int)
+    mri = np.vstack([s['sample']['mri'] for s in samples])
+    add = np.ones((len(mri), 1), dtype=int)
     mri = np.append(mri, add, axis=1)
     mri = np.transpose(mri)
     coords = np.matmul(np_T, mri)
@@ -143,6 +136,7 @@ class Analysis:
         Returns:
              dict: A dictionary representing the gene symbols and their corresponding p values
         """
+        import nibabel as nib
         if not gene_list:
             raise ValueError('Atleast one gene is needed for the analysis')
         if not (isinstance(roi1['data'], nib.nifti1.Nifti1Image) and isinstance(roi2['data'], nib.nifti1.Nifti1Image)):
@@ -170,6 +164,8 @@ class Analysis:
         Retrieve probe ids for the given gene lists, update self.probe_ids which will be used by download_and_save_zscores_samples() or download_and_save_zscores_samples_partial() to
         form the url and update self.gene_symbols to be used by get_mean_zscores()
         """
+        import requests
+        import xmltodict
         base_retrieve_probe_ids = "http://api.brain-map.org/api/v2/data/query.xml?criteria=model::Probe,rma::criteria,[probe_type$eq'DNA'],products[abbreviation$eq'HumanMA'],gene[acronym$eq"
         end_retrieve_probe_ids = "],rma::options[only$eq'probes.id']"
 
@@ -191,6 +187,20 @@ class Analysis:
             logging.getLogger(__name__).info('probe_ids: {}'.format(self.probe_ids))
             logging.getLogger(__name__).info('gene_symbols: {}'.format(self.gene_symbols))
 
+    def read_cached_probe_ids(self):
+        """
+        Read probe ids for the given gene lists from self.cache_dir/15496/probes.txt instead of querying Allen Brain Api, used when all the genes are present in the cache.
+        Update self.probe_keys and self.gene_symbols in the same order as the zscore columns read by read_cached_zscores_samples_and_specimen_data()
+        """
+        with open(os.path.join(self.cache_dir, '{}/probes.txt'.format(self.donor_ids[0])), 'r') as f:
+            probes = json.load(f)
+        probes = [probe for probe in probes if probe['gene-symbol'] in self.gene_list]
+        self.probe_keys = self.probe_keys + [str(probe['id']) for probe in probes]
+        self.gene_symbols = self.gene_symbols + [probe['gene-symbol'] for probe in probes]
+
+        if self.verbose:
+            logging.getLogger(__name__).info('probe_keys: {}'.format(self.probe_keys))
+            logging.getLogger(__name__).info('gene_symbols: {}'.format(self.gene_symbols))
 
     def read_cached_zscores_samples_and_specimen_data(self):
         """
@@ -238,6 +248,7 @@ class Analysis:
         Returns:
                 dict: A dictionary representing the just downloaded samples, probes and zscores for the given donor_id and the probes given by self.probe_ids.
         """
+        import requests
         base_query_api = "http://api.brain-map.org/api/v2/data/query.json?criteria=service::human_microarray_expression[probes$in"
         probes = ''.join('{},'.format(probe) for probe in self.probe_ids)[:-1]
         end_query_api = "][donors$eq{}]".format(donor_id)
@@ -317,6 +328,7 @@ class Analysis:
         Args:
               donor_id (int): Id of a donor which is used to query Allen Brain API.
         """
+        import requests
         base_url_download_and_save_zscores_samples_partial = "http://api.brain-map.org/api/v2/data/query.json?criteria=service::human_microarray_expression[probes$in"
         probes = ''.join('{},'.format(probe) for probe in self.probe_ids)[:-1]
         end_url_download_and_save_zscores_samples_partial = "][donors$eq{}]".format(donor_id)
@@ -352,6 +364,7 @@ class Analysis:
         Download names and transformation matrix for each specimen/donor from Allen Brain Api and save them on disk as specimenName.txt
         and specimenMat.txt respectively, load.
         """
+        import requests
         base_url_download_specimens = "http://api.brain-map.org/api/v2/data/Specimen/query.json?criteria=[name$eq"+"'"
         end_url_download_specimens = "']&include=alignment3d"
         specimens  = ['H0351.1015', 'H0351.1012', 'H0351.1016', 'H0351.2001', 'H0351.1009', 'H0351.2002']
@@ -416,10 +429,12 @@ class Analysis:
             if self.gene_list_to_download:
                 logging.getLogger(__name__).info('Microarray expression values of {} gene(s) need(s) to be downloaded'.format(len(self.gene_list_to_download)))
                 logging.getLogger(__name__).info('genes to be downloaded:{} '.format(self.gene_list_to_download))
-            self.retrieve_probe_ids()
             if self.gene_list_to_download:
+                self.retrieve_probe_ids()
                 for donor in self.donor_ids:
                     self.__download_and_save_zscores_and_samples_partial(donor)
+            else:
+                self.read_cached_probe_ids()
             self.read_cached_zscores_samples_and_specimen_data()
 
     def get_mean_zscores(self, combined_zscores):
@@ -429,6 +444,7 @@ class Analysis:
         Args:
              combined_zscores (list): lists of zscores corresponding to each region of interest, populated from filtered_coords_and_zscores
         """
+        from scipy.stats import mstats
         unique_gene_symbols = np.unique(self.gene_symbols)
         '''
         A = [a,a,a,b,b,b,c,c]
@@ -441,9 +457,9 @@ class Analysis:
                 for j in range(len(combined_zscores)):
                     for k in range(len(indices[i])):
                         tmp[j] = combined_zscores[j][indices[i][k]][:]
-                winsorzed_mean_zscores[j][i] = np.mean(sp.stats.mstats.winsorize(tmp[j], limits=0.1))
+                winsorzed_mean_zscores[j][i] = np.mean(mstats.winsorize(tmp[j], limits=0.1))
         '''
-        winsorzed_mean_zscores =  np.array([[np.mean(sp.stats.mstats.winsorize([combined_zscores[j][indices[i][k]] for k in range(0, len(indices[i]))], limits=0.1)) for i in range (len(unique_gene_symbols))] for j in range(len(combined_zscores))])
+        winsorzed_mean_zscores =  np.array([[np.mean(mstats.winsorize([combined_zscores[j][indices[i][k]] for k in range(0, len(indices[i]))], limits=0.1)) for i in range (len(unique_gene_symbols))] for j in range(len(combined_zscores))])
         self.genesymbol_and_mean_zscores['uniqueId'] = unique_gene_symbols
         self.genesymbol_and_mean_zscores['combined_zscores'] = winsorzed_mean_zscores
 
@@ -509,6 +525,8 @@ class Analysis:
         """
         Perform one iteration of ANOVA. Use output of this to populate F_vec_ref_anovan which becomes initial estimate of n_rep passes of FWE.
         """
+        from statsmodels.formula.api import ols
+        from statsmodels.stats.anova import anova_lm
         self.F_vec_ref_anovan = np.zeros(self.n_genes)
         for i in range(self.n_genes):
             if self.single_probe_mode:
@@ -516,17 +534,19 @@ class Analysis:
             else:
                 self.anova_factors['Zscores'] = self.genesymbol_and_mean_zscores['combined_zscores'][:,i]
             mod = ols('Zscores ~ Area + Specimen + Age + Race', data=self.anova_factors).fit()
-            aov_table = sm.stats.anova_lm(mod, typ=1)
+            aov_table = anova_lm(mod, typ=1)
             if self.verbose:
                 logging.getLogger(__name__).info('aov table: {}'.format(aov_table))
             #F_vec_ref_anovan is used as an initial condition to F_mat_perm_anovan in fwe_correction
             self.F_vec_ref_anovan[i] = aov_table['F'][0]
 
-    def do_anova_with_permutation_gene(self, index_to_gene_list):
+    def do_anova_with_permutation_gene(self, index_to_gene_list, ols, anova_lm):
         """
         Perform one repetition of anova for each gene
         Args:
               index_to_gene_list (int) : Index into the genesymbol_and_mean_zscores['combined_zscores'] array, representing mean zscore of a gene.
+              ols (function) : statsmodels.formula.api.ols, passed in by do_anova_with_permutation_rep().
+              anova_lm (function) : statsmodels.stats.anova.anova_lm, passed in by do_anova_with_permutation_rep().
         Returns:
                  float: F value extracted from the anova table
         """
@@ -536,7 +556,7 @@ class Analysis:
         else:
             self.anova_factors['Zscores'] = self.genesymbol_and_mean_zscores['combined_zscores'][:,index_to_gene_list]
         mod = ols('Zscores ~ Area + Specimen + Age + Race', data=self.anova_factors).fit()
-        aov_table = sm.stats.anova_lm(mod, typ=1)
+        aov_table = anova_lm(mod, typ=1)
         return aov_table['F'][0]
 
     def do_anova_with_permutation_rep(self):
@@ -545,7 +565,9 @@ class Analysis:
         Returns:
                  list: a list of F_values, one for each gene.
         """
-        return list(map(self.do_anova_with_permutation_gene, range(0,self.n_genes)))
+        from statsmodels.formula.api import ols
+        from statsmodels.stats.anova import anova_lm
+        return [self.do_anova_with_permutation_gene(i, ols, anova_lm) for i in range(0,self.n_genes)]
 
 
     def fwe_correction(self):
@@ -600,6 +622,7 @@ class Analysis:
         Args:
              cache (str): Location where the specimen_factors dict will be stored.
         """
+        import requests
         url_build_specimen_factors = "http://api.brain-map.org/api/v2/data/query.json?criteria=model::Donor,rma::criteria,products[id$eq2],rma::include,age,rma::options[only$eq%27donors.id,donors.name,donors.race_only,donors.sex%27]"
         try:
             text = requests.get(url_build_specimen_factors).json()
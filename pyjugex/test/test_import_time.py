@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Import-time benchmark and regression test for pyjugex.pyjugex.
+Each measurement runs in a fresh interpreter so that the import is cold.
+Example:
+    $ python pyjugex/test/test_import_time.py
+    $ python -m pytest pyjugex/test/test_import_time.py
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MAX_COLD_IMPORT_SECONDS = 1.5
+HEAVY_MODULES = ['requests', 'xmltodict', 'scipy', 'statsmodels', 'patsy', 'pandas', 'nibabel']
+
+IMPORT_SCRIPT = """
+import sys, json, time
+start = time.time()
+from pyjugex import pyjugex
+elapsed = time.time() - start
+print(json.dumps({'seconds' : elapsed, 'modules' : sorted(sys.modules)}))
+"""
+
+CACHE_HIT_SCRIPT = """
+import sys, os, json, shutil, tempfile
+import numpy as np
+from pyjugex import pyjugex
+tmp_dir = tempfile.mkdtemp()
+try:
+    cache_dir = os.path.join(tmp_dir, '.pyjugex')
+    donor_ids = ['15496', '14380', '15697', '9861', '12876', '10021']
+    samples = [{'sample' : {'mri' : [10, 20, 30]}}, {'sample' : {'mri' : [11, 21, 31]}}]
+    probes = [{'id' : 1, 'gene-symbol' : 'ADRA2A', 'z-score' : ['0.1', '0.2']},
+              {'id' : 2, 'gene-symbol' : 'CNR1', 'z-score' : ['0.3', '0.4']},
+              {'id' : 3, 'gene-symbol' : 'ADRA2A', 'z-score' : ['0.5', '0.6']}]
+    for donor in donor_ids:
+        donor_path = os.path.join(cache_dir, donor)
+        os.makedirs(donor_path)
+        with open(os.path.join(donor_path, 'samples.txt'), 'w') as f:
+            json.dump(samples, f)
+        with open(os.path.join(donor_path, 'probes.txt'), 'w') as f:
+            json.dump(probes, f)
+        with open(os.path.join(donor_path, 'specimenName.txt'), 'w') as f:
+            f.write('H0351.{}'.format(donor))
+        np.savetxt(os.path.join(donor_path, 'specimenMat.txt'), np.eye(4))
+    jugex = pyjugex.Analysis(gene_cache_dir=cache_dir)
+    jugex.set_candidate_genes(['ADRA2A'])
+    assert jugex.probe_keys == ['1', '3']
+    assert jugex.gene_symbols == ['ADRA2A', 'ADRA2A']
+    for specimen, data in zip(jugex.samples_zscores_and_specimen_dict['specimen_info'], jugex.samples_zscores_and_specimen_dict['samples_and_zscores']):
+        assert data['zscores'].tolist() == [[0.1, 0.5], [0.2, 0.6]]
+        pyjugex.transform_samples_MRI_to_MNI52(data['samples'], specimen['alignment3d'])
+finally:
+    shutil.rmtree(tmp_dir)
+print(json.dumps({'modules' : sorted(sys.modules)}))
+"""
+
+def run_in_fresh_interpreter(script):
+    """
+    Run script in a new python process with the repository on the path and decode the json it prints on its last line.
+    Args:
+          script (str): Python source to execute.
+    Returns:
+          dict: The decoded json output of the script.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([REPO_ROOT, env.get('PYTHONPATH', '')])
+    output = subprocess.check_output([sys.executable, '-c', script], env=env, cwd=REPO_ROOT)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+def loaded_heavy_modules(modules):
+    """
+    Return the heavy top level packages found among the given module names.
+    """
+    return sorted(set(m.split('.')[0] for m in modules) & set(HEAVY_MODULES))
+
+def test_cold_import_time():
+    result = run_in_fresh_interpreter(IMPORT_SCRIPT)
+    assert result['seconds'] < MAX_COLD_IMPORT_SECONDS, 'cold import took {:.3f}s'.format(result['seconds'])
+
+def test_import_does_not_load_heavy_modules():
+    result = run_in_fresh_interpreter(IMPORT_SCRIPT)
+    assert loaded_heavy_modules(result['modules']) == []
+
+def test_cache_hit_does_not_load_heavy_modules():
+    result = run_in_fresh_interpreter(CACHE_HIT_SCRIPT)
+    assert 'requests' not in result['modules']
+    assert 'xmltodict' not in result['modules']
+    assert loaded_heavy_modules(result['modules']) == []
+
+if __name__ == '__main__':
+    n_runs = 5
+    timings = [run_in_fresh_interpreter(IMPORT_SCRIPT)['seconds'] for i in range(n_runs)]
+    print('cold import of pyjugex.pyjugex over {} runs: min {:.3f}s mean {:.3f}s max {:.3f}s'.format(n_runs, min(timings), sum(timings)/n_runs, max(timings)))
+    print('heavy modules loaded on import: {}'.format(loaded_heavy_modules(run_in_fresh_interpreter(IMPORT_SCRIPT)['modules'])))
+    print('heavy modules loaded on cache hit: {}'.format(loaded_heavy_modules(run_in_fresh_interpreter(CACHE_HIT_SCRIPT)['modules'])))